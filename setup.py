@@ -23,8 +23,9 @@ setup(
     python_requires=">=3.8",
     install_requires=[
         "feedparser",
-        "requests",
-        "beautifulsoup4",
+        "httpx[http2]",
+        "lxml",
+        "selectolax",
     ],
     entry_points={
         "console_scripts": [
@@ -3,20 +3,58 @@
 Unit tests for the Threat Intelligence Monitor.
 """
 
+import asyncio
+import csv
+import hashlib
+import json
 import os
+import sqlite3
+import tempfile
+import time
 import unittest
+from collections import Counter
 from datetime import datetime, timedelta
+from email.utils import format_datetime
 from unittest.mock import patch, MagicMock, call
 
-from threat_intel.monitor import ThreatIntelligenceMonitor
+import httpx
+
+from threat_intel import content
+from threat_intel.monitor import ThreatIntelligenceMonitor, CSV_FIELDS
 from threat_intel.database import ThreatDatabase
-from threat_intel.content import ContentExtractor
+from threat_intel.content import ContentExtractor, MAX_REQUESTS_PER_HOST
+from threat_intel.utils import RateLimiter
+
+
+def make_rss(items):
+    """Build an RSS document from (title, link, published) tuples."""
+    entries = "".join(
+        f"<item><title>{title}</title><link>{link}</link>"
+        f"<pubDate>{format_datetime(published.astimezone())}</pubDate>"
+        f"<description>Summary of {title}</description></item>"
+        for title, link, published in items
+    )
+    return f"<?xml version='1.0'?><rss version='2.0'><channel><title>Test</title>{entries}</channel></rss>"
+
+
+def make_article(url, content, keywords, published_date=None):
+    """Build an article dictionary for ThreatDatabase.add_articles_bulk."""
+    return {
+        "source_id": 1,
+        "title": f"Article {url}",
+        "url": url,
+        "published_date": published_date or datetime.now(),
+        "summary": "Summary",
+        "full_content": content,
+        "keywords": keywords
+    }
 
 
 class MockMonitor(ThreatIntelligenceMonitor):
     """A special version of the monitor that's easier to test."""
     
-    def _process_feed(self, source_id, name, url, feed_type, last_updated, days_back):
+    async def _process_feed(self, source_id, name, url, feed_type, last_updated, days_back,
+                            etag=None, last_modified=None):
         """
         Override the _process_feed method to return predetermined results.
         """
@@ -69,6 +107,9 @@ class TestThreatIntelligenceMonitor(unittest.TestCase):
     
     def tearDown(self):
         """Clean up after tests."""
+        self.monitor.close()
+        self.mock_monitor.close()
+        
         # Remove test database
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
@@ -133,5 +174,468 @@ class TestThreatIntelligenceMonitor(unittest.TestCase):
             self.assertEqual(trends[0][1], 5)
 
 
+class TestThreatDatabase(unittest.TestCase):
+    """Test cases for the ThreatDatabase class."""
+    
+    def setUp(self):
+        """Set up a temporary database directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+    
+    def tearDown(self):
+        """Clean up after tests."""
+        self.tmp_dir.cleanup()
+    
+    def _open(self):
+        """Open the test database, closing it at the end of the test."""
+        db = ThreatDatabase(db_path=self.db_path)
+        self.addCleanup(db.close)
+        return db
+    
+    def _create_legacy_database(self, page_size=4096):
+        """Create a database in the original schema, before any migrations."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(f"PRAGMA page_size = {page_size}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(
+            "CREATE TABLE sources (id INTEGER PRIMARY KEY, name TEXT UNIQUE, url TEXT, "
+            "type TEXT, last_updated TIMESTAMP, error_count INTEGER DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE articles (id INTEGER PRIMARY KEY, source_id INTEGER, title TEXT, "
+            "url TEXT UNIQUE, published_date TIMESTAMP, retrieved_date TIMESTAMP, summary TEXT, "
+            "full_content TEXT, keywords TEXT)"
+        )
+        conn.execute("INSERT INTO sources (id, name, url, type) VALUES (1, 'Old Feed', 'https://old.example.com', 'rss')")
+        recent = datetime.now().isoformat()
+        stale = (datetime.now() - timedelta(days=30)).isoformat()
+        conn.executemany(
+            "INSERT INTO articles (source_id, title, url, published_date, summary, full_content, keywords) "
+            "VALUES (1, ?, ?, ?, '', ?, ?)",
+            [
+                ("a", "https://old.example.com/a", recent, "ransomware gang", "ransomware,gang"),
+                ("b", "https://old.example.com/b", recent, "ransomware patch", "ransomware,patch"),
+                ("c", "https://old.example.com/c", stale, "old news", "ransomware,old"),
+            ]
+        )
+        conn.commit()
+        conn.close()
+    
+    def test_add_articles_bulk_skips_known_urls(self):
+        """Only unseen URLs are added, each with its keywords."""
+        db = self._open()
+        
+        added = db.add_articles_bulk([
+            make_article("https://example.com/1", "one", ["alpha"]),
+            make_article("https://example.com/2", "two", ["beta"]),
+            make_article("https://example.com/1", "dup", ["alpha"]),
+        ])
+        
+        self.assertEqual(added, 2)
+        self.assertEqual(db.add_articles_bulk([make_article("https://example.com/2", "two", [])]), 0)
+        self.assertEqual(db.get_article_keywords(days=1), [("alpha", 1), ("beta", 1)])
+    
+    def test_filter_new_urls(self):
+        """Stored URLs are filtered out before fetching."""
+        db = self._open()
+        db.add_articles_bulk([make_article("https://example.com/1", "one", [])])
+        
+        self.assertEqual(
+            db.filter_new_urls(["https://example.com/1", "https://example.com/2", "https://example.com/2"]), 
+            {"https://example.com/2"}
+        )
+        self.assertEqual(db.filter_new_urls([]), set())
+    
+    def test_search_full_text_and_like_fallback(self):
+        """Searches match substrings through FTS and through the LIKE fallback."""
+        db = self._open()
+        db.add_articles_bulk([
+            make_article("https://example.com/1", "LockBit ransomware hits hospitals", ["lockbit"]),
+            make_article("https://example.com/2", "Patch Tuesday roundup", ["patch"]),
+        ])
+        
+        for fts_enabled in (db._fts_enabled, False):
+            with self.subTest(fts_enabled=fts_enabled):
+                db._fts_enabled = fts_enabled
+                results = db.search_articles(query="ransom", days=1)
+                self.assertEqual([article["url"] for article in results], ["https://example.com/1"])
+        
+        # Queries too short for trigrams use LIKE
+        self.assertEqual(len(db.search_articles(query="Tu", days=1)), 1)
+        self.assertEqual(len(db.search_articles(days=1)), 2)
+    
+    def test_legacy_keywords_are_backfilled(self):
+        """Keywords of articles stored before article_keywords existed count in trends."""
+        self._create_legacy_database()
+        db = self._open()
+        
+        self.assertEqual(
+            db.get_article_keywords(days=3), 
+            [("ransomware", 2), ("gang", 1), ("patch", 1)]
+        )
+        self.assertEqual(db.get_article_keywords(days=60, limit=1), [("ransomware", 3)])
+    
+    def test_page_size_migration(self):
+        """Existing databases are rebuilt with larger pages and stay in WAL mode."""
+        self._create_legacy_database(page_size=4096)
+        db = self._open()
+        conn = db._connect()
+        
+        self.assertEqual(conn.execute("PRAGMA page_size").fetchone()[0], 8192)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(len(db.search_articles(query="ransomware", days=60)), 3)
+    
+    def test_prune_content_cache(self):
+        """Cached page content expires by age."""
+        db = self._open()
+        db.cache_content("https://example.com/1", "fp", "text", ["kw"])
+        
+        self.assertEqual(db.prune_content_cache(max_age_days=1), 0)
+        self.assertEqual(db.get_cached_content("fp"), ("text", ["kw"]))
+        self.assertEqual(db.prune_content_cache(max_age_days=-1), 1)
+        self.assertIsNone(db.get_cached_content("fp"))
+
+
+class TestContentExtractor(unittest.TestCase):
+    """Test cases for the ContentExtractor class."""
+    
+    def setUp(self):
+        """Create an extractor without a content cache."""
+        self.extractor = ContentExtractor(delay=0)
+    
+    def tearDown(self):
+        """Clean up after tests."""
+        self.extractor.close()
+    
+    def test_removed_nodes_keep_words_apart(self):
+        """Text around removed comments and elements isn't glued together."""
+        html = "<html><body><article>alpha<!-- x -->beta<header>H</header>gamma</article></body></html>"
+        
+        full_text, _, _ = self.extractor._process_article("https://example.com", html)
+        
+        self.assertEqual(full_text, "alpha beta gamma")
+    
+    def test_keywords_merge_cve_case(self):
+        """CVE IDs count as one term regardless of case and are weighted up."""
+        keywords = self.extractor._extract_keywords("cve-2024-1234 exploit exploit CVE-2024-1234 the")
+        self.assertEqual(keywords, ["CVE-2024-1234", "exploit"])
+        
+        # Differently cased text isn't served the memoized result
+        self.assertEqual(self.extractor._extract_keywords("Cve-2024-9999 exploit")[0], "CVE-2024-9999")
+    
+    def test_keyword_memo_keeps_top_terms_only(self):
+        """The memo holds a bounded list of top terms that serves later calls."""
+        text = " ".join(f"term{i:04d} " * (i % 7 + 1) for i in range(500))
+        expected = [word for word, count in self.extractor._count_terms(text).most_common(20)]
+        
+        self.assertEqual(self.extractor._extract_keywords(text, max_keywords=20), expected)
+        self.assertEqual(self.extractor._extract_keywords(text, max_keywords=20), expected)
+        self.assertEqual(self.extractor._extract_keywords(text, max_keywords=5), expected[:5])
+        cached = content._keyword_cache[hashlib.sha256(text.encode("utf-8")).digest()]
+        self.assertEqual(len(cached), content._KEYWORD_CACHE_TERMS)
+
+
+class TestScheduling(unittest.TestCase):
+    """Test refresh scheduling and rate limiting."""
+    
+    def test_is_due(self):
+        """Sources are due once their (downward jittered) interval has passed."""
+        now = datetime.now()
+        is_due = ThreatIntelligenceMonitor._is_due
+        
+        self.assertTrue(is_due({"last_updated": None}, now))
+        for _ in range(50):
+            self.assertFalse(is_due({"last_updated": now.isoformat()}, now))
+            self.assertTrue(is_due({"last_updated": (now - timedelta(hours=1)).isoformat()}, now))
+            self.assertFalse(is_due(
+                {"last_updated": (now - timedelta(hours=1)).isoformat(), "refresh_interval": 7200}, now
+            ))
+    
+    def test_rate_limiter_reserve(self):
+        """Requests to one host are spaced out; other hosts don't wait."""
+        limiter = RateLimiter(base_delay=1.0)
+        
+        self.assertEqual(limiter.reserve("https://a.example.com/1"), 0)
+        self.assertGreater(limiter.reserve("https://A.example.com/2"), 0.9)
+        self.assertEqual(limiter.reserve("https://b.example.com/1"), 0)
+    
+    def test_busy_host_does_not_block_others(self):
+        """Requests waiting on one host's delay don't hold request slots."""
+        extractor = ContentExtractor(delay=0.3)
+        self.addCleanup(extractor.close)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, html="<p>x</p>"))
+        options = dict(ContentExtractor._client_options(), transport=transport)
+        finished = {}
+        
+        async def fetch(url, start):
+            await extractor.extract_article_content_async(url)
+            finished[url] = time.monotonic() - start
+        
+        async def run():
+            start = time.monotonic()
+            async with extractor.async_session(max_concurrency=2):
+                await asyncio.gather(
+                    *(fetch(f"https://busy.example.com/{i}", start) for i in range(6)),
+                    fetch("https://quiet.example.com/1", start)
+                )
+        
+        with patch.object(extractor, "_client_options", return_value=options):
+            asyncio.run(run())
+        
+        self.assertLess(finished["https://quiet.example.com/1"], 0.3)
+        self.assertGreater(max(finished.values()), 1.0)
+    
+    def test_requests_in_flight_per_host_are_capped(self):
+        """Slow hosts get at most MAX_REQUESTS_PER_HOST concurrent requests."""
+        extractor = ContentExtractor(delay=0.01)
+        self.addCleanup(extractor.close)
+        in_flight = Counter()
+        peak = Counter()
+        
+        async def handle(request):
+            host = request.url.host
+            in_flight[host] += 1
+            peak[host] = max(peak[host], in_flight[host])
+            await asyncio.sleep(0.1)
+            in_flight[host] -= 1
+            return httpx.Response(200, html="<p>x</p>")
+        
+        options = dict(ContentExtractor._client_options(), transport=httpx.MockTransport(handle))
+        
+        async def run():
+            async with extractor.async_session(max_concurrency=16):
+                await asyncio.gather(
+                    *(extractor.extract_article_content_async(f"https://slow.example.com/{i}") for i in range(8)),
+                    extractor.fetch_feed("https://slow.example.com/feed"),
+                    extractor.extract_article_content_async("https://other.example.com/1")
+                )
+        
+        with patch.object(extractor, "_client_options", return_value=options):
+            asyncio.run(run())
+        
+        self.assertEqual(peak["slow.example.com"], MAX_REQUESTS_PER_HOST)
+        self.assertEqual(peak["other.example.com"], 1)
+
+
+class TestFeedPipeline(unittest.TestCase):
+    """Test the fetch/parse/store pipeline of update_feeds over a stubbed transport."""
+    
+    FEED_URL = "https://feeds.example.com/rss"
+    
+    def setUp(self):
+        """Set up a monitor with a single source served by a mock transport."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.monitor = ThreatIntelligenceMonitor(
+            db_path=os.path.join(self.tmp_dir.name, "test.db"),
+            delay=0,
+            max_workers=4,
+            verbose=False
+        )
+        
+        # Replace the default sources with one test feed
+        with self.monitor.db._transaction(immediate=True) as cursor:
+            cursor.execute("DELETE FROM sources")
+            cursor.execute(
+                "INSERT INTO sources (name, url, type) VALUES (?, ?, ?)",
+                ("Test Feed", self.FEED_URL, "rss")
+            )
+        
+        now = datetime.now()
+        self.feed = make_rss([
+            ("Fresh one", "https://blog.example.com/one", now - timedelta(hours=1)),
+            ("Fresh two", "https://blog.example.com/two", now - timedelta(hours=2)),
+            ("Old", "https://blog.example.com/old", now - timedelta(days=10)),
+        ])
+        self.feed_charset = "utf-8"
+        self.requests = []
+        
+        transport = httpx.MockTransport(self._handle)
+        options = dict(ContentExtractor._client_options(), transport=transport)
+        patcher = patch.object(self.monitor.extractor, "_client_options", return_value=options)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        """Clean up after tests."""
+        self.monitor.close()
+        self.tmp_dir.cleanup()
+    
+    def _handle(self, request):
+        """Serve the feed (honoring If-None-Match) and article pages."""
+        self.requests.append(request)
+        if str(request.url) == self.FEED_URL:
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(
+                200, 
+                content=self.feed.encode(self.feed_charset),
+                headers={"ETag": '"v1"', "Content-Type": f"application/rss+xml; charset={self.feed_charset}"}
+            )
+        
+        name = request.url.path.strip("/")
+        return httpx.Response(
+            200, 
+            html=f"<html><body><article>Ransomware report {name}: patch CVE-2024-1234 now</article></body></html>"
+        )
+    
+    def _article_requests(self):
+        """URLs of the article pages requested so far."""
+        return [str(request.url) for request in self.requests if str(request.url) != self.FEED_URL]
+    
+    def test_update_stores_recent_articles(self):
+        """New entries within days_back are fetched and stored in one run."""
+        stats = self.monitor.update_feeds(days_back=1)
+        
+        self.assertEqual(stats["feeds_processed"], 1)
+        self.assertEqual(stats["new_articles"], 2)
+        self.assertEqual(stats["errors"], 0)
+        self.assertCountEqual(
+            self._article_requests(), 
+            ["https://blog.example.com/one", "https://blog.example.com/two"]
+        )
+        
+        articles = self.monitor.search_articles(query="ransomware", days=1)
+        self.assertEqual(len(articles), 2)
+        self.assertIn("CVE-2024-1234", articles[0]["keywords"].split(","))
+        self.assertEqual(self.monitor.db.get_sources()[0]["etag"], '"v1"')
+    
+    def test_unchanged_feed_is_not_parsed(self):
+        """A 304 for the stored ETag skips parsing and article fetches."""
+        self.monitor.update_feeds(days_back=1)
+        self.requests.clear()
+        
+        with patch.object(self.monitor.extractor, "parse_feed") as mock_parse:
+            results = asyncio.run(self.monitor._update_sources(self.monitor.db.get_sources(), 1))
+        
+        self.assertEqual(results[0]["new_articles"], 0)
+        self.assertEqual(self.requests[0].headers.get("If-None-Match"), '"v1"')
+        self.assertEqual(self._article_requests(), [])
+        mock_parse.assert_not_called()
+    
+    def test_recently_updated_feed_is_skipped(self):
+        """Sources within their refresh interval get no request at all."""
+        self.monitor.update_feeds(days_back=1)
+        self.requests.clear()
+        
+        stats = self.monitor.update_feeds(days_back=1)
+        
+        self.assertEqual(stats["feeds_skipped"], 1)
+        self.assertEqual(stats["feeds_processed"], 0)
+        self.assertEqual(self.requests, [])
+    
+    def test_forced_update_refetches_feed(self):
+        """Forced updates fetch the feed unconditionally but skip stored articles."""
+        self.monitor.update_feeds(days_back=1)
+        self.requests.clear()
+        
+        stats = self.monitor.update_feeds(days_back=30, force=True)
+        
+        self.assertEqual(stats["feeds_processed"], 1)
+        self.assertNotIn("If-None-Match", self.requests[0].headers)
+        # Only the entry newly inside the window is fetched
+        self.assertEqual(self._article_requests(), ["https://blog.example.com/old"])
+        self.assertEqual(stats["new_articles"], 1)
+    
+    def test_relative_links_resolve_against_feed_url(self):
+        """Entry links resolve against the feed URL and the header charset is used."""
+        self.feed = make_rss([("Café breach", "/posts/three", datetime.now() - timedelta(hours=1))])
+        self.feed_charset = "iso-8859-1"
+        
+        stats = self.monitor.update_feeds(days_back=1)
+        
+        self.assertEqual(stats["new_articles"], 1)
+        self.assertEqual(self._article_requests(), ["https://feeds.example.com/posts/three"])
+        article = self.monitor.search_articles(days=1)[0]
+        self.assertEqual(article["url"], "https://feeds.example.com/posts/three")
+        self.assertEqual(article["title"], "Café breach")
+    
+    def test_failed_insert_keeps_feed_due(self):
+        """A batch that can't be stored leaves no validators behind."""
+        with patch.object(self.monitor.db, "add_articles_bulk", 
+                          side_effect=sqlite3.OperationalError("disk I/O error")):
+            stats = self.monitor.update_feeds(days_back=1)
+        
+        self.assertEqual(stats["errors"], 1)
+        source = self.monitor.db.get_sources()[0]
+        self.assertIsNone(source["etag"])
+        self.assertIsNone(source["last_updated"])
+        
+        # The next run fetches and stores the entries
+        self.assertEqual(self.monitor.update_feeds(days_back=1)["new_articles"], 2)
+
+
+class TestExports(unittest.TestCase):
+    """Test exporting articles to files."""
+    
+    def setUp(self):
+        """Set up a monitor and articles to export."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.monitor = ThreatIntelligenceMonitor(
+            db_path=os.path.join(self.tmp_dir.name, "test.db"),
+            verbose=False
+        )
+        self.articles = [
+            {
+                "id": 1,
+                "title": "Café breach, \"part 1\"",
+                "source_name": "Test Source",
+                "published_date": datetime(2024, 5, 1, 12, 30).isoformat(),
+                "url": "https://example.com/1",
+                "summary": "Line one\nLine two",
+                "keywords": "CVE-2024-1234,ransomware"
+            },
+            {
+                "id": 2,
+                "title": "Patch notes",
+                "source_name": "Other Source",
+                "published_date": datetime(2024, 5, 2).isoformat(),
+                "url": "https://example.com/2",
+                "summary": "",
+                "keywords": ""
+            }
+        ]
+    
+    def tearDown(self):
+        """Clean up after tests."""
+        self.monitor.close()
+        self.tmp_dir.cleanup()
+    
+    def test_export_to_csv_round_trip(self):
+        """CSV exports read back as the exported columns."""
+        filename = os.path.join(self.tmp_dir.name, "out", "articles.csv")
+        
+        self.monitor.export_to_csv(self.articles, filename)
+        
+        with open(filename, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(tuple(rows[0]), CSV_FIELDS)
+        self.assertEqual(rows, [{field: article[field] for field in CSV_FIELDS} for article in self.articles])
+    
+    def test_export_to_csv_requires_every_column(self):
+        """Articles missing an exported column are rejected."""
+        del self.articles[1]["keywords"]
+        
+        with self.assertRaises(KeyError):
+            self.monitor.export_to_csv(self.articles, os.path.join(self.tmp_dir.name, "articles.csv"))
+    
+    def test_export_to_json_round_trip(self):
+        """JSON exports read back the same with orjson and with the stdlib encoder."""
+        for encoder in ("default", "json"):
+            with self.subTest(encoder=encoder):
+                filename = os.path.join(self.tmp_dir.name, encoder, "articles.json")
+                
+                if encoder == "json":
+                    with patch("threat_intel.monitor.orjson", None):
+                        self.monitor.export_to_json(self.articles, filename)
+                else:
+                    self.monitor.export_to_json(self.articles, filename)
+                
+                with open(filename, encoding="utf-8") as f:
+                    report = json.load(f)
+                self.assertEqual(report["article_count"], 2)
+                self.assertEqual(report["articles"], self.articles)
+                datetime.fromisoformat(report["generated_at"])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -35,7 +35,8 @@ def main(args: List[str] = None) -> int:
     # Global options
     parser.add_argument("--db", default="threat_intel.db", help="Database file path")
     parser.add_argument("--delay", type=float, default=1.0, help="Delay between requests in seconds")
-    parser.add_argument("--workers", type=int, default=3, help="Maximum number of concurrent workers")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Maximum number of concurrent workers (default: 5 per CPU, up to 32)")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
     
     # Command modes
@@ -44,6 +45,8 @@ def main(args: List[str] = None) -> int:
     # Update command
     update_parser = subparsers.add_parser("update", help="Update feeds and store new articles")
     update_parser.add_argument("-d", "--days", type=int, default=1, help="Process articles from last N days")
+    update_parser.add_argument("-f", "--force", action="store_true",
+                               help="Update and fully re-download all feeds, including ones refreshed recently")
     
     # Search command
     search_parser = subparsers.add_parser("search", help="Search for articles")
@@ -65,6 +68,7 @@ def main(args: List[str] = None) -> int:
         parser.print_help()
         return 0
     
+    monitor = None
     try:
         # Initialize the monitor
         monitor = ThreatIntelligenceMonitor(
@@ -77,9 +81,10 @@ def main(args: List[str] = None) -> int:
         # Execute the appropriate command
         if args.command == "update":
             print(f"Updating feeds (looking back {args.days} days)...")
-            stats = monitor.update_feeds(days_back=args.days)
+            stats = monitor.update_feeds(days_back=args.days, force=args.force)
             print(f"\nUpdate complete:")
             print(f"Feeds processed: {stats['feeds_processed']}")
+            print(f"Feeds skipped (recently updated): {stats['feeds_skipped']}")
             print(f"New articles: {stats['new_articles']}")
             print(f"Errors: {stats['errors']}")
         
@@ -120,6 +125,10 @@ def main(args: List[str] = None) -> int:
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         return 1
+    
+    finally:
+        if monitor is not None:
+            monitor.close()
 
 
 if __name__ == "__main__":
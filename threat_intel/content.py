@@ -3,60 +3,351 @@
 Content extraction and processing for the Threat Intelligence Monitor.
 """
 
+import asyncio
+import concurrent.futures
+import contextlib
+import hashlib
+import io
 import logging
 import re
-from collections import Counter
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any, Union
+from html.parser import HTMLParser
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any, Union
 
 import feedparser
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import lxml.html
+from lxml import etree
 
-from .utils import get_random_user_agent, create_request_headers, RateLimiter
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+except ImportError:  # Fall back to the stdlib tag stripper
+    SelectolaxParser = None
+
+from .database import ThreatDatabase
+from .utils import get_random_user_agent, create_request_headers, RateLimiter, _netloc
 
 logger = logging.getLogger("threat_intel")
 
+# Top terms of recently analyzed texts, keyed by a digest of the exact text.
+# Only the leading terms are kept, since a long article's full term count
+# can run to hundreds of kilobytes
+_KEYWORD_CACHE_SIZE = 256
+_KEYWORD_CACHE_TERMS = 100
+_keyword_cache: "OrderedDict[bytes, List[str]]" = OrderedDict()
+_keyword_cache_lock = threading.Lock()
+
+# Upper bound on how much of an article page is downloaded; anything past
+# this is truncated so one huge (or hostile) page can't stall a worker
+MAX_CONTENT_BYTES = 2_000_000
+_CHUNK_SIZE = 65536
+
+# HTTP client connection pool; HTTP/2 multiplexes concurrent requests to
+# the same host over a single connection
+_CONNECTION_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Requests in flight to any one host during an async session
+MAX_REQUESTS_PER_HOST = 2
+
+# Precompiled patterns for text cleanup and keyword extraction
+_WS_RE = re.compile(r'\s+')
+# CVE IDs and single words (at least 3 chars) are matched in one scan
+_TERM_RE = re.compile(r'\b(?:CVE-\d{4}-\d{4,}|[a-zA-Z][a-zA-Z0-9]{2,})\b', re.IGNORECASE)
+_CVE_WEIGHT = 5
+
+# Common words that never make useful keywords
+_STOPWORDS = frozenset({
+    "the", "and", "is", "in", "it", "to", "of", "for", "with", "on",
+    "that", "this", "be", "are", "as", "at", "have", "has", "was",
+    "were", "from", "by", "not", "or", "an", "but", "a", "they",
+    "we", "their", "our", "you", "i", "he", "she", "will", "would",
+    "could", "can", "may", "should", "been", "his", "her", "them",
+    "about", "there", "these", "those", "who", "what", "when", "where"
+})
+
+# Parse article pages as UTF-8 (bodies are decoded before parsing)
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# Elements that never contain article content
+_NON_CONTENT_TAGS = ("script", "style", "iframe", "nav", "footer", "header", "aside")
+
+# Comments and non-content elements, found in a single pass
+_NON_CONTENT_XPATH = etree.XPath(
+    " | ".join(("//comment()",) + tuple(f"//{tag}" for tag in _NON_CONTENT_TAGS))
+)
+
+
+def _class_xpath(class_name: str) -> str:
+    """Build an XPath matching the first element carrying a CSS class."""
+    return f"(//*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')])[1]"
+
+
+# Main content containers in order of preference, compiled once
+_CONTENT_XPATHS = tuple(etree.XPath(expr) for expr in (
+    "(//article)[1]",
+    _class_xpath("post-content"),
+    _class_xpath("entry-content"),
+    _class_xpath("article-body"),
+    _class_xpath("article-content"),
+    _class_xpath("content-article"),
+    _class_xpath("post__content"),
+    _class_xpath("story-body"),
+    "(//main)[1]",
+    "(//*[@id='content'])[1]",
+    _class_xpath("content"),
+    "(//*[@itemprop='articleBody'])[1]",
+    _class_xpath("main-content"),
+    "(//*[@id='main-content'])[1]",
+))
+
+
+class _TagStripper(HTMLParser):
+    """Collects the text of an HTML fragment, skipping script and style."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in ("script", "style"):
+            self._skip_depth += 1
+    
+    def handle_endtag(self, tag: str) -> None:
+        if tag in ("script", "style") and self._skip_depth:
+            self._skip_depth -= 1
+    
+    def handle_data(self, data: str) -> None:
+        data = data.strip()
+        if data and not self._skip_depth:
+            self.parts.append(data)
+
+
+def _strip_tags(markup: str) -> str:
+    """
+    Reduce an HTML fragment to its text.
+    
+    Args:
+        markup: HTML fragment
+        
+    Returns:
+        Text content, space separated
+    """
+    if SelectolaxParser is not None:
+        return SelectolaxParser(markup).text(separator=' ', strip=True)
+    
+    stripper = _TagStripper()
+    stripper.feed(markup)
+    stripper.close()
+    return ' '.join(stripper.parts)
+
+
+def _content_fp(text: str) -> str:
+    """
+    Compute a normalized fingerprint of a piece of text.
+    
+    Case and whitespace differences are ignored so trivially reformatted
+    copies of the same page share a fingerprint.
+    
+    Args:
+        text: Text to fingerprint
+        
+    Returns:
+        Hex-encoded SHA-256 digest
+    """
+    normalized = _WS_RE.sub(' ', text.strip().lower())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
 
 class ContentExtractor:
     """
     Handles content extraction from security feeds and articles.
     """
     
-    def __init__(self, delay: float = 1.0):
+    def __init__(self, delay: float = 1.0, cache: Optional[ThreatDatabase] = None, 
+                 executor: Optional[concurrent.futures.Executor] = None):
         """
         Initialize the content extractor.
         
         Args:
             delay: Base delay between requests in seconds
+            cache: Database used to cache extracted content by page fingerprint
+            executor: Executor that parses pages during async sessions (the
+                event loop's default executor if None)
         """
         self.rate_limiter = RateLimiter(base_delay=delay)
-        self.session = requests.Session()
-        self.session.headers.update(create_request_headers())
+        self.cache = cache
+        self.executor = executor
+        # One HTTP/2 client shared by all callers (httpx clients are
+        # thread-safe), so articles from the same host share a connection
+        self.client = httpx.Client(**self._client_options())
+        
+        # Asynchronous client and request slots (overall and per host), only
+        # while an async session is open
+        self.async_client: Optional[httpx.AsyncClient] = None
+        self._request_slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Optional[Dict[str, asyncio.Semaphore]] = None
     
-    def parse_feed(self, url: str, feed_type: str = "rss") -> Dict[str, Any]:
+    def close(self) -> None:
         """
-        Parse an RSS or Atom feed.
+        Close the HTTP client.
+        """
+        self.client.close()
+    
+    @staticmethod
+    def _client_options() -> Dict[str, Any]:
+        """
+        Get the settings shared by the synchronous and asynchronous clients.
+        
+        Returns:
+            Keyword arguments for httpx.Client / httpx.AsyncClient
+        """
+        return {
+            "http2": True,
+            "limits": _CONNECTION_LIMITS,
+            "timeout": 15,
+            "follow_redirects": True,
+            "headers": create_request_headers()
+        }
+    
+    @contextlib.asynccontextmanager
+    async def async_session(self, max_concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        Open an asynchronous HTTP session for fetch_feed and
+        extract_article_content_async.
+        
+        Args:
+            max_concurrency: Maximum number of requests in flight at once
+            
+        Yields:
+            The asynchronous HTTP client
+        """
+        self._request_slots = asyncio.Semaphore(max_concurrency)
+        self._host_slots = {}
+        try:
+            async with httpx.AsyncClient(**self._client_options()) as client:
+                self.async_client = client
+                yield client
+        finally:
+            self.async_client = None
+            self._request_slots = None
+            self._host_slots = None
+    
+    @contextlib.asynccontextmanager
+    async def _request_slot(self, url: str) -> AsyncIterator[None]:
+        """
+        Wait for permission to send a request within an async session.
+        
+        At most MAX_REQUESTS_PER_HOST requests to a host are in flight at
+        once, each spaced by the rate limiter. The host's delay is waited out
+        before taking one of the overall request slots, so a busy host doesn't
+        hold slots that requests to other hosts could use.
+        
+        Args:
+            url: URL about to be requested
+        """
+        host = _netloc(url)
+        host_slots = self._host_slots.get(host)
+        if host_slots is None:
+            host_slots = self._host_slots[host] = asyncio.Semaphore(MAX_REQUESTS_PER_HOST)
+        
+        async with host_slots:
+            await asyncio.sleep(max(0.0, self.rate_limiter.reserve(url)))
+            async with self._request_slots:
+                yield
+    
+    async def fetch_feed(self, url: str, etag: Optional[str] = None, 
+                         last_modified: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Download a feed document within an async session.
+        
+        The request is conditional on the validators stored from the previous
+        fetch, so an unchanged feed comes back as an empty 304. The document
+        is parsed separately with parse_feed.
         
         Args:
             url: URL of the feed
-            feed_type: Type of feed (rss, atom)
+            etag: ETag from the previous fetch
+            last_modified: Last-Modified value from the previous fetch
             
         Returns:
-            Dictionary containing feed data
+            Dictionary with the raw body ("data", None if the feed is
+            unchanged), the final "url" after redirects, the "content_type"
+            header and the new "etag"/"last_modified" values
             
         Raises:
-            ValueError: If feed cannot be parsed
+            httpx.HTTPError: If HTTP request fails
         """
+        headers = {"User-Agent": get_random_user_agent()}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        
         # Rate limit requests to the feed provider
-        self.rate_limiter.wait_if_needed(url)
+        async with self._request_slot(url):
+            response = await self.async_client.get(url, headers=headers)
         
-        # Use a random user agent for each request
-        headers = self.session.headers.copy()
-        headers["User-Agent"] = get_random_user_agent()
+        if response.status_code == 304:
+            return {"data": None, "url": url, "content_type": None, 
+                    "etag": etag, "last_modified": last_modified}
         
-        # Parse the feed
-        feed = feedparser.parse(url, request_headers=headers)
+        response.raise_for_status()
+        return {
+            "data": response.content,
+            "url": str(response.url),
+            "content_type": response.headers.get("Content-Type"),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+    
+    def parse_feed(self, url: str, feed_type: str = "rss", 
+                   data: Optional[bytes] = None, etag: Optional[str] = None, 
+                   modified: Optional[str] = None, 
+                   content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parse an RSS or Atom feed.
+        
+        Args:
+            url: URL of the feed (the final URL after redirects if data is
+                given, so relative entry links resolve against it)
+            feed_type: Type of feed (rss, atom)
+            data: Raw feed document if it was already downloaded
+            etag: ETag from the previous fetch, to make the request conditional
+            modified: Last-Modified value from the previous fetch
+            content_type: Content-Type header of the downloaded document,
+                which may carry its charset
+            
+        Returns:
+            Dictionary containing feed data (with status 304 and no entries
+            if the feed hasn't changed)
+            
+        Raises:
+            ValueError: If feed cannot be parsed
+        """
+        if data is not None:
+            # Already fetched, so this is parse-only; pass on what feedparser
+            # would have seen over HTTP to resolve links and the encoding
+            response_headers = {"content-location": url}
+            if content_type:
+                response_headers["content-type"] = content_type
+            feed = feedparser.parse(data, response_headers=response_headers)
+        else:
+            # Rate limit requests to the feed provider
+            self.rate_limiter.wait_if_needed(url)
+            
+            # Use a random user agent for each request; feedparser supplies
+            # the rest of the headers itself
+            headers = {"User-Agent": get_random_user_agent()}
+            
+            # Parse the feed
+            feed = feedparser.parse(url, request_headers=headers, etag=etag, modified=modified)
+            
+            # Unchanged since the last fetch
+            if feed.get("status") == 304:
+                return feed
         
         # Check for HTTP errors
         if hasattr(feed, 'status') and feed.status >= 400:
@@ -111,132 +402,221 @@ class ContentExtractor:
             summary = "No summary available"
         
         # Clean summary of HTML
-        return BeautifulSoup(summary, "html.parser").get_text(separator=' ', strip=True)
+        return _strip_tags(summary)
     
-    def extract_article_content(self, url: str) -> Tuple[str, List[str]]:
+    def extract_article_content(self, url: str, force: bool = False) -> Tuple[str, List[str]]:
         """
         Extract article content using HTTP requests.
         
+        Pages whose body was already processed (same fingerprint) are served
+        from the content cache instead of being parsed again.
+        
         Args:
             url: URL of the article
+            force: Re-extract the content even if the page is cached
                 
         Returns:
             Tuple of (full_content, keywords)
-            
-        Raises:
-            requests.RequestException: If HTTP request fails
         """
         try:
             # Apply rate limiting by domain
             self.rate_limiter.wait_if_needed(url)
             
-            # Ensure we have a fresh user agent
-            self.session.headers.update({"User-Agent": get_random_user_agent()})
-            
-            # Make the request
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
+            # Use a fresh user agent for this request only; the client is shared
+            headers = {"User-Agent": get_random_user_agent()}
             
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(response.text, "html.parser")
+            # Stream the response so the body read is bounded
+            with self.client.stream("GET", url, headers=headers) as response:
+                response.raise_for_status()
+                
+                buffer = io.BytesIO()
+                for chunk in response.iter_bytes(_CHUNK_SIZE):
+                    buffer.write(chunk)
+                    if buffer.tell() > MAX_CONTENT_BYTES:
+                        logger.debug("Truncating %s at %d bytes", url, MAX_CONTENT_BYTES)
+                        break
+                
+                html = buffer.getvalue().decode(response.encoding or "utf-8", errors="replace")
             
-            # Remove non-content elements
-            for element in soup(["script", "style", "iframe", "nav", "footer", "header", "aside"]):
-                element.decompose()
+            full_text, keywords, body_fp = self._process_article(url, html, force)
+            if body_fp is not None and self.cache is not None:
+                self.cache.cache_content(url, body_fp, full_text, keywords)
             
-            # Try to find the main content
-            content = self._find_main_content(soup)
+            return full_text, keywords
             
-            # Extract text and clean it
-            if content:
-                full_text = content.get_text("\n", strip=True)
-                # Remove excessive whitespace
-                full_text = re.sub(r'\n+', '\n', full_text)
-                full_text = re.sub(r'\s+', ' ', full_text)
-            else:
-                full_text = "Content extraction failed"
+        except Exception as e:
+            logger.error("Error extracting content from %s: %s", url, e)
+            return f"Content extraction failed: {str(e)}", []
+    
+    async def extract_article_content_async(self, url: str, 
+                                            force: bool = False) -> Tuple[str, List[str], Optional[str]]:
+        """
+        Extract article content within an async session.
+        
+        The download is asynchronous; parsing runs in the extractor's executor
+        so it doesn't hold up other downloads. Newly extracted content isn't
+        cached here: the caller stores it along with the article by passing
+        the returned fingerprint to ThreatDatabase.add_articles_bulk.
+        
+        Args:
+            url: URL of the article
+            force: Re-extract the content even if the page is cached
+                
+        Returns:
+            Tuple of (full_content, keywords, body_fp), where body_fp is the
+            page fingerprint to cache the content under (None if the content
+            came from the cache or extraction failed)
+        """
+        try:
+            headers = {"User-Agent": get_random_user_agent()}
             
-            # Extract keywords
-            keywords = self._extract_keywords(full_text)
+            # Apply rate limiting by domain
+            async with self._request_slot(url):
+                # Stream the response so the body read is bounded
+                async with self.async_client.stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+                    
+                    buffer = io.BytesIO()
+                    async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                        buffer.write(chunk)
+                        if buffer.tell() > MAX_CONTENT_BYTES:
+                            logger.debug("Truncating %s at %d bytes", url, MAX_CONTENT_BYTES)
+                            break
+                    
+                    html = buffer.getvalue().decode(response.encoding or "utf-8", errors="replace")
             
-            return full_text, keywords
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._process_article, url, html, force)
             
         except Exception as e:
-            logger.error(f"Error extracting content from {url}: {str(e)}")
-            return f"Content extraction failed: {str(e)}", []
+            logger.error("Error extracting content from %s: %s", url, e)
+            return f"Content extraction failed: {str(e)}", [], None
+    
+    def _process_article(self, url: str, html: str, 
+                         force: bool = False) -> Tuple[str, List[str], Optional[str]]:
+        """
+        Extract the article text and keywords from a downloaded page.
+        
+        Args:
+            url: URL of the article
+            html: Page body
+            force: Re-extract the content even if the page is cached
+            
+        Returns:
+            Tuple of (full_content, keywords, body_fp), with body_fp None if
+            the content came from the cache
+        """
+        # Skip the parse entirely if we've already seen this exact body
+        body_fp = _content_fp(html)
+        if self.cache is not None and not force:
+            cached = self.cache.get_cached_content(body_fp)
+            if cached is not None:
+                logger.debug("Content cache hit for %s", url)
+                return cached + (None,)
+        
+        # Parse with lxml
+        tree = lxml.html.document_fromstring(html.encode("utf-8"), parser=_HTML_PARSER)
+        
+        # Remove non-content elements, keeping the text that follows them
+        # separated from the text before them
+        for node in _NON_CONTENT_XPATH(tree):
+            if node.getparent() is not None:
+                if node.tail:
+                    node.tail = " " + node.tail
+                node.drop_tree()
+        
+        # Try to find the main content
+        content = self._find_main_content(tree)
+        
+        # Extract text and clean it
+        if content is not None:
+            full_text = " ".join(content.itertext())
+            # Remove excessive whitespace
+            full_text = _WS_RE.sub(' ', full_text).strip()
+        else:
+            full_text = "Content extraction failed"
+        
+        # Extract keywords
+        keywords = self._extract_keywords(full_text)
+        
+        return full_text, keywords, body_fp
     
-    def _find_main_content(self, soup: BeautifulSoup) -> Optional[Any]:
+    def _find_main_content(self, tree: lxml.html.HtmlElement) -> Optional[lxml.html.HtmlElement]:
         """
         Find the main content element in a parsed HTML page.
         
         Args:
-            soup: BeautifulSoup object
+            tree: Parsed lxml document
             
         Returns:
-            BeautifulSoup element containing the main content
-        """
-        # General content selectors in order of preference
-        content_selectors = [
-            "article", 
-            ".post-content", 
-            ".entry-content",
-            ".article-body",
-            ".article-content",
-            ".content-article",
-            ".post__content",
-            ".story-body",
-            "main",
-            "#content",
-            ".content",
-            "[itemprop='articleBody']",
-            ".main-content",
-            "#main-content"
-        ]
-        
-        for selector in content_selectors:
-            content = soup.select_one(selector)
-            if content:
-                return content
+            Element containing the main content
+        """
+        for xpath in _CONTENT_XPATHS:
+            matches = xpath(tree)
+            if matches:
+                return matches[0]
         
         # If no specific content container found, use body
-        return soup.body
+        return tree.find("body")
     
     def _extract_keywords(self, text: str, max_keywords: int = 10) -> List[str]:
         """
         Extract keywords from text using frequency analysis.
         
+        The top terms are memoized by a digest of the text (in a small LRU),
+        so re-posted or refreshed articles skip the tokenizing work. The text
+        is hashed as is; normalizing it first would cost about as much as a
+        large part of the counting it saves.
+        
         Args:
             text: Text to analyze
-            max_keywords: Maximum number of keywords to return
+            max_keywords: Maximum number of keywords to return (at most
+                _KEYWORD_CACHE_TERMS)
             
         Returns:
             List of keywords
         """
-        # Common stopwords
-        stopwords = {
-            "the", "and", "is", "in", "it", "to", "of", "for", "with", "on",
-            "that", "this", "be", "are", "as", "at", "have", "has", "was",
-            "were", "from", "by", "not", "or", "an", "but", "a", "they",
-            "we", "their", "our", "you", "i", "he", "she", "will", "would",
-            "could", "can", "may", "should", "been", "his", "her", "them",
-            "about", "there", "these", "those", "who", "what", "when", "where"
-        }
+        fp = hashlib.sha256(text.encode("utf-8")).digest()
         
-        # Extract potential CVE IDs and other security identifiers
-        security_ids = re.findall(r'\b(?:CVE|cve)-\d{4}-\d{4,}\b', text)
+        with _keyword_cache_lock:
+            top_terms = _keyword_cache.get(fp)
+            if top_terms is not None:
+                _keyword_cache.move_to_end(fp)
         
-        # Tokenize single words (at least 3 chars)
-        words = re.findall(r'\b[a-zA-Z][a-zA-Z0-9]{2,}\b', text.lower())
-        filtered_words = [word for word in words if word not in stopwords]
+        if top_terms is None:
+            # Get the most common terms
+            word_counts = self._count_terms(text)
+            top_terms = [word for word, count in word_counts.most_common(_KEYWORD_CACHE_TERMS)]
+            with _keyword_cache_lock:
+                _keyword_cache[fp] = top_terms
+                if len(_keyword_cache) > _KEYWORD_CACHE_SIZE:
+                    _keyword_cache.popitem(last=False)
         
-        # Get most common words
-        word_counts = Counter(filtered_words)
+        return top_terms[:max_keywords]
+    
+    def _count_terms(self, text: str) -> Counter:
+        """
+        Count candidate keyword terms in text.
+        
+        Args:
+            text: Text to analyze
+            
+        Returns:
+            Counter of terms, with security identifiers weighted higher
+        """
+        # Match case-insensitively and lowercase only the matched terms (never
+        # a copy of the whole text). Matches are streamed from finditer rather
+        # than collected by findall, so no list of every token is built; the
+        # maps and Counter still run in C
+        word_counts = Counter(map(str.lower, map(re.Match.group, _TERM_RE.finditer(text))))
         
-        # Add security IDs with higher weight
-        for id_term in security_ids:
-            word_counts[id_term] = word_counts.get(id_term, 0) + 5
+        # Drop stopwords once per distinct term rather than once per match
+        for word in _STOPWORDS.intersection(word_counts):
+            del word_counts[word]
         
-        # Get the most common terms
-        keywords = [word for word, count in word_counts.most_common(max_keywords)]
+        # Give security IDs (the only terms with a '-') a higher weight and
+        # their canonical upper-case form
+        for term in [term for term in word_counts if "-" in term]:
+            word_counts[term.upper()] = word_counts.pop(term) * _CVE_WEIGHT
         
-        return keywords
\ No newline at end of file
+        return word_counts
@@ -3,63 +3,170 @@
 Database management for the Threat Intelligence Monitor.
 """
 
+import contextlib
+import hashlib
 import logging
 import sqlite3
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Any, Set, Tuple, Union
 
-from .utils import DEFAULT_SECURITY_FEEDS
+from .utils import DEFAULT_FEED_PRIORITY, DEFAULT_REFRESH_INTERVAL, DEFAULT_SECURITY_FEEDS
 
 logger = logging.getLogger("threat_intel")
 
+# Per-connection settings tuned for the insert-heavy update path (WAL
+# journaling, which these rely on, is persistent and set at creation)
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA cache_size = -65536",  # 64 MB
+)
 
-class DatabaseManager:
-    """Context manager for database operations."""
+# Statements run for every article or page; keeping them as constants means
+# each connection prepares them once and reuses them from its statement cache
+_INSERT_ARTICLE_SQL = """
+INSERT OR IGNORE INTO articles 
+(source_id, title, url, published_date, retrieved_date, summary, full_content, keywords)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_KEYWORD_SQL = "INSERT INTO article_keywords (article_id, keyword, published_date) VALUES (?, ?, ?)"
+_SELECT_CACHED_CONTENT_SQL = "SELECT full_content, keywords FROM articles_cache WHERE body_fp = ? LIMIT 1"
+_CACHE_CONTENT_SQL = """
+INSERT OR REPLACE INTO articles_cache (url_fp, body_fp, full_content, keywords, cached_date)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+# Database page size; article bodies overflow the default 4 KB pages
+_PAGE_SIZE = 8192
+
+# Size of each connection's prepared statement cache (the default is 128)
+_CACHED_STATEMENTS = 256
+
+# Largest number of bound parameters put in one statement (SQLite versions
+# before 3.32 allow at most 999)
+_MAX_SQL_PARAMS = 900
+
+
+def _url_fp(url: str) -> str:
+    """Compute the fingerprint a URL is cached under."""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class ThreatDatabase:
+    """Handles all database operations for the threat intelligence monitor."""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str = "threat_intel.db"):
         """
-        Initialize the database manager.
+        Initialize the database.
         
         Args:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        # Serializes writers from the update thread pool so they queue here
+        # instead of spinning on SQLite's busy timeout
+        self._write_lock = threading.Lock()
+        self._fts_enabled = False
+        
+        # One long-lived connection per thread (WAL lets them read alongside
+        # the writer); all of them are tracked with their owning thread so
+        # close() can reach them and those of finished threads can be closed
+        self._local = threading.local()
+        self._connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._connections_lock = threading.Lock()
+        
+        self._init_database()
     
-    def __enter__(self):
-        self.conn = sqlite3.connect(self.db_path)
-        # Enable foreign keys constraint enforcement
-        self.conn.execute("PRAGMA foreign_keys = ON")
-        # Add timeout to prevent database locked errors
-        self.conn.execute("PRAGMA busy_timeout = 30000")  # 30 seconds
-        
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
-        return self.cursor
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the calling thread's connection, opening it on first use.
+        
+        Returns:
+            Database connection in autocommit mode (transactions are explicit)
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path, 
+                isolation_level=None, 
+                check_same_thread=False, 
+                cached_statements=_CACHED_STATEMENTS
+            )
+            # Enable foreign keys constraint enforcement
+            conn.execute("PRAGMA foreign_keys = ON")
+            # Add timeout to prevent database locked errors
+            conn.execute("PRAGMA busy_timeout = 30000")  # 30 seconds
+            for pragma in _CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            conn.row_factory = sqlite3.Row
+            
+            self._local.conn = conn
+            with self._connections_lock:
+                self._close_orphaned_connections()
+                self._connections.append((threading.current_thread(), conn))
+        return conn
     
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            if exc_type is None:
-                self.conn.commit()
+    def _close_orphaned_connections(self) -> None:
+        """
+        Close the connections of threads that have exited.
+        
+        Their thread-local slot is gone, so nothing would use them again.
+        Must be called with the connections lock held.
+        """
+        live = []
+        for thread, conn in self._connections:
+            if thread.is_alive():
+                live.append((thread, conn))
             else:
-                self.conn.rollback()
-            self.conn.close()
-        return False  # Let exceptions propagate
-
-
-class ThreatDatabase:
-    """Handles all database operations for the threat intelligence monitor."""
+                conn.close()
+        self._connections = live
     
-    def __init__(self, db_path: str = "threat_intel.db"):
+    @contextlib.contextmanager
+    def _transaction(self, immediate: bool = False) -> Iterator[sqlite3.Cursor]:
         """
-        Initialize the database.
+        Run a block of statements in one transaction on this thread's connection.
+        
+        Commits if the block succeeds and rolls back if it raises.
         
         Args:
-            db_path: Path to the SQLite database file
+            immediate: Take the write lock when the transaction starts
+            
+        Yields:
+            Database cursor
         """
-        self.db_path = db_path
-        self._init_database()
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield cursor
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            cursor.close()
+    
+    def close(self) -> None:
+        """
+        Close every connection opened by this database.
+        
+        Lets SQLite refresh planner statistics where they've drifted first.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        
+        for _, conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.debug("PRAGMA optimize failed: %s", e)
+            conn.close()
+        
+        # Threads open a fresh connection if the database is used again
+        self._local = threading.local()
     
     def _init_database(self) -> None:
         """
@@ -69,19 +176,39 @@ class ThreatDatabase:
         configured feed sources are added to the database.
         """
         try:
-            with DatabaseManager(self.db_path) as cursor:
+            conn = self._connect()
+            self._set_page_size(conn)
+            
+            # WAL lets readers proceed alongside the writer and makes
+            # NORMAL sync safe; it's stored in the file, so set it once
+            # (outside a transaction, where it can't be changed)
+            conn.execute("PRAGMA journal_mode = WAL")
+            
+            with self._transaction(immediate=True) as cursor:
                 # Create tables if they don't exist
-                cursor.execute('''
+                cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS sources (
                     id INTEGER PRIMARY KEY,
                     name TEXT UNIQUE,
                     url TEXT,
                     type TEXT,
                     last_updated TIMESTAMP,
-                    error_count INTEGER DEFAULT 0
+                    error_count INTEGER DEFAULT 0,
+                    etag TEXT,
+                    last_modified TEXT,
+                    refresh_interval INTEGER DEFAULT {DEFAULT_REFRESH_INTERVAL},
+                    priority INTEGER DEFAULT {DEFAULT_FEED_PRIORITY}
                 )
                 ''')
                 
+                # Bring sources tables created by older versions up to date
+                self._add_missing_columns(cursor, "sources", {
+                    "etag": "TEXT",
+                    "last_modified": "TEXT",
+                    "refresh_interval": f"INTEGER DEFAULT {DEFAULT_REFRESH_INTERVAL}",
+                    "priority": f"INTEGER DEFAULT {DEFAULT_FEED_PRIORITY}"
+                })
+                
                 cursor.execute('''
                 CREATE TABLE IF NOT EXISTS articles (
                     id INTEGER PRIMARY KEY,
@@ -97,48 +224,247 @@ class ThreatDatabase:
                 )
                 ''')
                 
+                # One row per article keyword, so trends can be counted in SQL
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_keywords'"
+                )
+                backfill_keywords = cursor.fetchone() is None
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS article_keywords (
+                    article_id INTEGER,
+                    keyword TEXT,
+                    published_date TIMESTAMP,
+                    FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE
+                )
+                ''')
+                if backfill_keywords:
+                    self._backfill_article_keywords(cursor)
+                
+                # Extracted content keyed by page fingerprint, so unchanged
+                # pages don't need to be parsed again
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS articles_cache (
+                    url_fp TEXT,
+                    body_fp TEXT,
+                    full_content TEXT,
+                    keywords TEXT,
+                    cached_date TIMESTAMP
+                )
+                ''')
+                self._add_missing_columns(cursor, "articles_cache", {"cached_date": "TIMESTAMP"})
+                
                 # Create indexes for better query performance
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_pubdate ON articles(published_date)')
+                # Covering index for the recent-articles queries: the date filter,
+                # ORDER BY and LIMIT plus every selected column come from the index
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_articles_pubdate_source'"
+                )
+                analyze_articles = cursor.fetchone() is None
+                cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_articles_pubdate_source
+                ON articles(published_date DESC, source_id, id, title, url, summary, keywords)
+                ''')
+                cursor.execute('DROP INDEX IF EXISTS idx_articles_pubdate')
+                if analyze_articles:
+                    cursor.execute('ANALYZE articles')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source_id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_keywords_pubdate ON article_keywords(published_date, keyword)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_keywords_keyword ON article_keywords(keyword)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_keywords_article ON article_keywords(article_id)')
+                cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_cache_url ON articles_cache(url_fp)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_body ON articles_cache(body_fp)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_date ON articles_cache(cached_date)')
+                
+                # Full-text index for search (needs SQLite's FTS5 trigram tokenizer)
+                self._fts_enabled = self._init_fts(cursor)
                 
-                # Make sure all our sources are in the database
-                for feed in DEFAULT_SECURITY_FEEDS:
-                    cursor.execute(
-                        "INSERT OR IGNORE INTO sources (name, url, type) VALUES (?, ?, ?)",
-                        (feed["name"], feed["url"], feed.get("type", "rss"))
-                    )
+                # Make sure all our sources are in the database, with their
+                # current priorities
+                cursor.executemany(
+                    """
+                    INSERT INTO sources (name, url, type, priority) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET priority = excluded.priority
+                    """,
+                    [
+                        (feed["name"], feed["url"], feed.get("type", "rss"), 
+                         feed.get("priority", DEFAULT_FEED_PRIORITY))
+                        for feed in DEFAULT_SECURITY_FEEDS
+                    ]
+                )
+                
+                # Analyze any table that needs it so the planner starts out
+                # with statistics (0x10000 checks every table, not just ones
+                # used by this connection)
+                cursor.execute("PRAGMA optimize = 0x10002")
             
-            logger.info(f"Database initialized at {self.db_path}")
+            logger.info("Database initialized at %s", self.db_path)
                 
         except sqlite3.Error as e:
-            logger.error(f"Database error: {e}")
+            logger.error("Database error: %s", e)
             raise
     
+    @staticmethod
+    def _set_page_size(conn: sqlite3.Connection) -> None:
+        """
+        Switch the database file to larger pages if it doesn't use them yet.
+        
+        Article bodies are large, so bigger pages mean fewer overflow pages
+        to read them. An existing file has to be rebuilt with VACUUM, which
+        can't happen in WAL mode, so this runs before WAL is enabled.
+        
+        Args:
+            conn: Database connection outside any transaction
+        """
+        if conn.execute("PRAGMA page_size").fetchone()[0] == _PAGE_SIZE:
+            return
+        
+        try:
+            conn.execute("PRAGMA journal_mode = DELETE")
+            conn.execute(f"PRAGMA page_size = {_PAGE_SIZE}")
+            conn.execute("VACUUM")
+        except sqlite3.OperationalError as e:
+            # Another process has the database open; try again next time
+            logger.warning("Could not change database page size: %s", e)
+    
+    @staticmethod
+    def _backfill_article_keywords(cursor: sqlite3.Cursor) -> None:
+        """
+        Populate article_keywords from articles stored before it existed.
+        
+        Args:
+            cursor: Database cursor
+        """
+        cursor.execute("SELECT id, keywords, published_date FROM articles WHERE keywords != ''")
+        cursor.executemany(
+            _INSERT_KEYWORD_SQL,
+            [
+                (row["id"], keyword, row["published_date"])
+                for row in cursor.fetchall()
+                for keyword in row["keywords"].split(",")
+            ]
+        )
+    
+    @staticmethod
+    def _init_fts(cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the full-text search index over articles.
+        
+        The index is an external-content FTS5 table kept in sync by triggers.
+        The trigram tokenizer keeps the substring semantics of LIKE searches.
+        
+        Args:
+            cursor: Database cursor
+            
+        Returns:
+            Whether full-text search is available
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'"
+        )
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, summary, full_content, keywords,
+                content='articles', content_rowid='id', tokenize='trigram'
+            )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning("Full-text search unavailable, falling back to LIKE: %s", e)
+            return False
+        
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts (rowid, title, summary, full_content, keywords)
+            VALUES (new.id, new.title, new.summary, new.full_content, new.keywords);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, full_content, keywords)
+            VALUES ('delete', old.id, old.title, old.summary, old.full_content, old.keywords);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, full_content, keywords)
+            VALUES ('delete', old.id, old.title, old.summary, old.full_content, old.keywords);
+            INSERT INTO articles_fts (rowid, title, summary, full_content, keywords)
+            VALUES (new.id, new.title, new.summary, new.full_content, new.keywords);
+        END
+        ''')
+        
+        # Index the articles stored before the index existed
+        if not exists:
+            cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    @staticmethod
+    def _add_missing_columns(cursor: sqlite3.Cursor, table: str, 
+                             columns: Dict[str, str]) -> None:
+        """
+        Add columns that don't exist yet to an existing table.
+        
+        Args:
+            cursor: Database cursor
+            table: Name of the table
+            columns: Column names mapped to their SQL type declarations
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row["name"] for row in cursor.fetchall()}
+        
+        for name, declaration in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+    
+    @staticmethod
+    def _fetch_dicts(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+        """
+        Fetch the remaining rows of a query as dictionaries.
+        
+        The column names are read once from the cursor rather than per row.
+        
+        Args:
+            cursor: Cursor with an executed query
+            
+        Returns:
+            List of dictionaries mapping column names to values
+        """
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
     def get_sources(self) -> List[Dict[str, Any]]:
         """
         Get all sources from the database.
         
         Returns:
-            List of source dictionaries
+            List of source dictionaries, highest priority first
         """
-        with DatabaseManager(self.db_path) as cursor:
-            cursor.execute("SELECT id, name, url, type, last_updated FROM sources")
-            sources = [dict(row) for row in cursor.fetchall()]
+        with self._transaction() as cursor:
+            cursor.execute(
+                "SELECT id, name, url, type, last_updated, etag, last_modified, refresh_interval, priority "
+                "FROM sources ORDER BY priority DESC, id"
+            )
+            sources = self._fetch_dicts(cursor)
         return sources
     
-    def update_source_status(self, source_id: int, success: bool = True) -> None:
+    def update_source_status(self, source_id: int, success: bool = True, 
+                             updated_iso: Optional[str] = None) -> None:
         """
         Update the status of a source.
         
         Args:
             source_id: ID of the source to update
             success: Whether the update was successful
+            updated_iso: ISO timestamp to record as the update time (now if None)
         """
-        with DatabaseManager(self.db_path) as cursor:
+        with self._write_lock, self._transaction(immediate=True) as cursor:
             if success:
                 cursor.execute(
                     "UPDATE sources SET last_updated = ?, error_count = 0 WHERE id = ?",
-                    (datetime.now().isoformat(), source_id)
+                    (updated_iso or datetime.now().isoformat(), source_id)
                 )
             else:
                 cursor.execute(
@@ -146,6 +472,22 @@ class ThreatDatabase:
                     (source_id,)
                 )
     
+    def update_source_headers(self, source_id: int, etag: Optional[str], 
+                              last_modified: Optional[str]) -> None:
+        """
+        Store the HTTP cache validators last returned for a source's feed.
+        
+        Args:
+            source_id: ID of the source to update
+            etag: ETag response header
+            last_modified: Last-Modified response header
+        """
+        with self._write_lock, self._transaction(immediate=True) as cursor:
+            cursor.execute(
+                "UPDATE sources SET etag = ?, last_modified = ? WHERE id = ?",
+                (etag, last_modified, source_id)
+            )
+    
     def add_article(self, source_id: int, title: str, url: str, 
                     published_date: datetime, summary: str, 
                     full_content: str, keywords: List[str]) -> bool:
@@ -162,38 +504,192 @@ class ThreatDatabase:
             keywords: List of keywords
             
         Returns:
-            Whether the article was added (False if it already exists)
+            Whether the article was added (False if it already exists or
+                couldn't be stored)
         """
         try:
-            with DatabaseManager(self.db_path) as cursor:
-                # Check if article already exists
-                cursor.execute("SELECT id FROM articles WHERE url = ?", (url,))
-                if cursor.fetchone():
-                    return False
+            return self.add_articles_bulk([{
+                "source_id": source_id,
+                "title": title,
+                "url": url,
+                "published_date": published_date,
+                "summary": summary,
+                "full_content": full_content,
+                "keywords": keywords
+            }]) == 1
+        except sqlite3.Error:
+            return False
+    
+    def add_articles_bulk(self, articles: List[Dict[str, Any]], 
+                          retrieved_iso: Optional[str] = None) -> int:
+        """
+        Add a batch of articles to the database in a single transaction.
+        
+        Articles carrying a "body_fp" (see
+        ContentExtractor.extract_article_content_async) also have their
+        extracted content cached under it, in the same transaction.
+        
+        Args:
+            articles: Article dictionaries with the same fields as add_article,
+                plus an optional body_fp
+            retrieved_iso: ISO timestamp recorded as the retrieval time of
+                every article in the batch (now if None)
+            
+        Returns:
+            Number of articles added (existing URLs are skipped)
+            
+        Raises:
+            sqlite3.Error: If the batch couldn't be stored (nothing is added)
+        """
+        if not articles:
+            return 0
+        
+        retrieved_iso = retrieved_iso or datetime.now().isoformat()
+        rows = [
+            (
+                article["source_id"], 
+                article["title"], 
+                article["url"], 
+                article["published_date"].isoformat(), 
+                retrieved_iso,
+                article["summary"],
+                article["full_content"],
+                ",".join(article["keywords"])
+            )
+            for article in articles
+        ]
+        cache_rows = [
+            (
+                _url_fp(article["url"]),
+                article["body_fp"],
+                article["full_content"],
+                ",".join(article["keywords"]),
+                retrieved_iso
+            )
+            for article in articles if article.get("body_fp")
+        ]
+        
+        try:
+            # Take the write lock up front so the new rows are exactly
+            # those with an id past the current maximum
+            with self._write_lock, self._transaction(immediate=True) as cursor:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM articles")
+                last_id = cursor.fetchone()[0]
+                
+                # Existing URLs are skipped by the UNIQUE constraint
+                cursor.executemany(_INSERT_ARTICLE_SQL, rows)
+                added = cursor.rowcount
+                
+                # Index the keywords of the new rows (only the first article
+                # per URL was inserted)
+                if added:
+                    cursor.execute("SELECT url, id FROM articles WHERE id > ?", (last_id,))
+                    new_ids = dict(cursor.fetchall())
+                    
+                    keyword_rows = []
+                    for article in articles:
+                        article_id = new_ids.pop(article["url"], None)
+                        if article_id is not None:
+                            published_date = article["published_date"].isoformat()
+                            keyword_rows.extend(
+                                (article_id, keyword, published_date) for keyword in article["keywords"]
+                            )
+                    
+                    cursor.executemany(_INSERT_KEYWORD_SQL, keyword_rows)
+                
+                cursor.executemany(_CACHE_CONTENT_SQL, cache_rows)
+            
+            return added
                 
-                # Add the article
+        except sqlite3.Error as e:
+            logger.error("Error adding %d articles: %s", len(articles), e)
+            raise
+    
+    def filter_new_urls(self, urls: List[str]) -> Set[str]:
+        """
+        Find which article URLs are not stored yet.
+        
+        Args:
+            urls: Article URLs
+            
+        Returns:
+            Set of the URLs that aren't in the database
+        """
+        new_urls = set(urls)
+        if not new_urls:
+            return new_urls
+        
+        # Stay under SQLite's limit on bound parameters per statement
+        candidates = list(new_urls)
+        with self._transaction() as cursor:
+            for start in range(0, len(candidates), _MAX_SQL_PARAMS):
+                chunk = candidates[start:start + _MAX_SQL_PARAMS]
                 cursor.execute(
-                    """
-                    INSERT INTO articles 
-                    (source_id, title, url, published_date, retrieved_date, summary, full_content, keywords)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        source_id, 
-                        title, 
-                        url, 
-                        published_date.isoformat(), 
-                        datetime.now().isoformat(),
-                        summary,
-                        full_content,
-                        ",".join(keywords)
-                    )
+                    f"SELECT url FROM articles WHERE url IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                new_urls.difference_update(url for url, in cursor.fetchall())
+        
+        return new_urls
+    
+    def get_cached_content(self, body_fp: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Look up previously extracted content by page fingerprint.
+        
+        Args:
+            body_fp: Fingerprint of the raw page body
+            
+        Returns:
+            Tuple of (full_content, keywords), or None if not cached
+        """
+        with self._transaction() as cursor:
+            cursor.execute(_SELECT_CACHED_CONTENT_SQL, (body_fp,))
+            row = cursor.fetchone()
+        
+        if row is None:
+            return None
+        keywords = row["keywords"].split(",") if row["keywords"] else []
+        return row["full_content"], keywords
+    
+    def cache_content(self, url: str, body_fp: str, full_content: str, 
+                      keywords: List[str]) -> None:
+        """
+        Store extracted content for a page.
+        
+        Args:
+            url: URL of the page
+            body_fp: Fingerprint of the raw page body
+            full_content: Extracted article text
+            keywords: Extracted keywords
+        """
+        try:
+            with self._write_lock, self._transaction(immediate=True) as cursor:
+                cursor.execute(
+                    _CACHE_CONTENT_SQL, 
+                    (_url_fp(url), body_fp, full_content, ",".join(keywords), datetime.now().isoformat())
                 )
-                return True
-                
         except sqlite3.Error as e:
-            logger.error(f"Error adding article {url}: {e}")
-            return False
+            logger.error("Error caching content for %s: %s", url, e)
+    
+    def prune_content_cache(self, max_age_days: int = 7) -> int:
+        """
+        Remove cached page content older than a given age.
+        
+        Args:
+            max_age_days: Keep content cached within the last N days
+            
+        Returns:
+            Number of cache entries removed
+        """
+        cutoff_date = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        
+        with self._write_lock, self._transaction(immediate=True) as cursor:
+            # Entries from before cached_date was recorded count as expired
+            cursor.execute(
+                "DELETE FROM articles_cache WHERE cached_date IS NULL OR cached_date < ?",
+                (cutoff_date,)
+            )
+            return cursor.rowcount
     
     def search_articles(self, query: Optional[str] = None, days: int = 7, 
                         limit: int = 20) -> List[Dict[str, Any]]:
@@ -208,13 +704,32 @@ class ThreatDatabase:
         Returns:
             List of matching articles
         """
-        with DatabaseManager(self.db_path) as cursor:
+        with self._transaction() as cursor:
             # Calculate date cutoff
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             
             if query:
                 # Clean and prepare the query
                 query = query.strip()
+            
+            if query and self._fts_enabled and len(query) >= 3:
+                # Match the query as a phrase; with the trigram tokenizer this
+                # is a substring match across all indexed fields
+                phrase = '"' + query.replace('"', '""') + '"'
+                
+                sql = """
+                SELECT a.id, a.title, a.url, a.published_date, a.summary, a.keywords, s.name as source_name
+                FROM articles_fts f
+                JOIN articles a ON a.id = f.rowid
+                JOIN sources s ON a.source_id = s.id
+                WHERE articles_fts MATCH ?
+                  AND a.published_date > ?
+                ORDER BY a.published_date DESC
+                LIMIT ?
+                """
+                cursor.execute(sql, (phrase, cutoff_date, limit))
+            elif query:
+                # Trigrams can't match queries shorter than 3 characters
                 search_term = f"%{query}%"
                 
                 # Search across multiple fields
@@ -245,44 +760,35 @@ class ThreatDatabase:
                 """
                 cursor.execute(sql, (cutoff_date, limit))
             
-            articles = [dict(row) for row in cursor.fetchall()]
+            articles = self._fetch_dicts(cursor)
         
         return articles
     
-    def get_article_keywords(self, days: int = 3) -> List[Tuple[str, int]]:
+    def get_article_keywords(self, days: int = 3, 
+                             limit: Optional[int] = None) -> List[Tuple[str, int]]:
         """
         Get keywords from recent articles for trend analysis.
         
         Args:
             days: Look at articles from last N days
+            limit: Maximum number of keywords to return (all if None)
             
         Returns:
-            List of (keyword, count) tuples
+            List of (keyword, count) tuples, most frequent first
         """
-        with DatabaseManager(self.db_path) as cursor:
-            # Calculate date cutoff
-            cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-            
-            # Get keywords from recent articles
+        # Calculate date cutoff
+        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+        
+        with self._transaction() as cursor:
             cursor.execute(
-                "SELECT keywords FROM articles WHERE published_date > ?",
-                (cutoff_date,)
+                """
+                SELECT keyword, COUNT(*) AS count
+                FROM article_keywords
+                WHERE published_date > ?
+                GROUP BY keyword
+                ORDER BY count DESC, keyword
+                LIMIT ?
+                """,
+                (cutoff_date, -1 if limit is None else limit)
             )
-            
-            keyword_rows = cursor.fetchall()
-            
-        # Build a list of all keywords
-        all_keywords = []
-        for row in keyword_rows:
-            if row["keywords"]:
-                all_keywords.extend(row["keywords"].split(","))
-        
-        # Count occurrences
-        keyword_counts = {}
-        for keyword in all_keywords:
-            keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
-        
-        # Sort by count
-        sorted_keywords = sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)
-        
-        return sorted_keywords
\ No newline at end of file
+            return [tuple(row) for row in cursor.fetchall()]
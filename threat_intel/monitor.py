@@ -3,20 +3,41 @@
 Main monitoring functionality for the Threat Intelligence Monitor.
 """
 
+import asyncio
 import concurrent.futures
 import csv
+import functools
 import json
 import logging
+import operator
 import os
+import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder
+    orjson = None
 
 from .content import ContentExtractor
 from .database import ThreatDatabase
-from .utils import DEFAULT_SECURITY_FEEDS, setup_logging
+from .utils import DEFAULT_FEED_PRIORITY, DEFAULT_REFRESH_INTERVAL, DEFAULT_SECURITY_FEEDS, setup_logging
 
 logger = logging.getLogger("threat_intel")
 
+# Let sources come due up to this fraction of the interval early, so sources
+# that were added together drift apart instead of all refreshing on the same
+# run. Jitter is only ever downward: a run exactly one interval after the
+# last update (e.g. an hourly cron) always finds the source due
+REFRESH_JITTER = 0.1
+
+# Days extracted page content stays in the content cache
+CONTENT_CACHE_DAYS = 7
+
+# Columns written by export_to_csv, in order
+CSV_FIELDS = ("title", "source_name", "published_date", "url", "summary", "keywords")
+
 
 class ThreatIntelligenceMonitor:
     """
@@ -29,7 +50,7 @@ class ThreatIntelligenceMonitor:
     def __init__(self, feeds: Optional[List[Dict[str, Any]]] = None, 
                  db_path: str = "threat_intel.db", 
                  delay: float = 1.0, 
-                 max_workers: int = 5,
+                 max_workers: Optional[int] = None,
                  verbose: bool = False):
         """
         Initialize the threat intelligence monitor.
@@ -38,78 +59,142 @@ class ThreatIntelligenceMonitor:
             feeds: List of feed dictionaries with name and URL
             db_path: Path to SQLite database file
             delay: Delay between requests in seconds to avoid rate limiting
-            max_workers: Maximum number of concurrent workers for parallelization
+            max_workers: Maximum number of concurrent HTTP requests
+                (defaults to min(32, 5 * CPU count) since feed fetching is I/O bound)
             verbose: Whether to print detailed output for debugging
         """
         self.feeds = feeds or DEFAULT_SECURITY_FEEDS
         self.db_path = db_path
         self.delay = delay
-        self.max_workers = max_workers
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 5)
         
         # Set up logging if not already configured
         if not logger.handlers:
             setup_logging(verbose=verbose)
         
         # Prioritize feeds to process more important ones first
-        self.feeds = sorted(self.feeds, key=lambda f: f.get("priority", 5), reverse=True)
-        
-        # Initialize content extractor
-        self.extractor = ContentExtractor(delay=delay)
+        self.feeds = sorted(
+            self.feeds, key=lambda f: f.get("priority", DEFAULT_FEED_PRIORITY), reverse=True
+        )
         
         # Initialize database
         self.db = ThreatDatabase(db_path=db_path)
+        
+        # Worker threads for parsing and database work during updates. They
+        # are reused across runs (each asyncio.run would otherwise start a
+        # fresh default executor), so the database keeps one connection per
+        # worker rather than one per run
+        self._executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="threat_intel")
+        
+        # Initialize content extractor, caching extracted pages in the database
+        self.extractor = ContentExtractor(delay=delay, cache=self.db, executor=self._executor)
     
-    def update_feeds(self, days_back: int = 1) -> Dict[str, int]:
+    def update_feeds(self, days_back: int = 1, force: bool = False) -> Dict[str, int]:
         """
         Update all feeds and store new articles using concurrent processing.
         
+        Sources refreshed within their refresh interval are skipped without
+        any network request.
+        
         Args:
             days_back: Only process articles from the last N days
+            force: Update every source, even ones refreshed recently, and
+                download every feed in full (ignoring its ETag/Last-Modified)
             
         Returns:
             Statistics about the update process
         """
         stats = {
             "feeds_processed": 0,
+            "feeds_skipped": 0,
             "new_articles": 0,
             "errors": 0
         }
         
-        # Get all sources from database
+        # Get all sources from database, highest priority first so they
+        # get the first request slots
         sources = self.db.get_sources()
         
-        # Process each feed concurrently using ThreadPoolExecutor
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_source = {
-                executor.submit(
-                    self._process_feed, 
-                    source["id"], 
-                    source["name"], 
-                    source["url"], 
-                    source["type"], 
-                    source.get("last_updated"), 
-                    days_back
-                ): source["name"]
-                for source in sources
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_source):
-                source_name = future_to_source[future]
-                try:
-                    result = future.result()
-                    stats["feeds_processed"] += 1
-                    stats["new_articles"] += result["new_articles"]
-                    
-                    logger.info(f"Processed {source_name}: {result['new_articles']} new articles")
-                        
-                except Exception as e:
-                    stats["errors"] += 1
-                    logger.error(f"Error processing {source_name}: {str(e)}")
+        if not force:
+            now = datetime.now()
+            due_sources = [source for source in sources if self._is_due(source, now)]
+            stats["feeds_skipped"] = len(sources) - len(due_sources)
+            sources = due_sources
+        
+        # Expire old cached page content before adding more
+        self.db.prune_content_cache(max_age_days=CONTENT_CACHE_DAYS)
+        
+        # Process every feed concurrently on one event loop
+        results = asyncio.run(self._update_sources(sources, days_back, force=force))
+        
+        for source, result in zip(sources, results):
+            if isinstance(result, Exception):
+                stats["errors"] += 1
+                logger.error("Error processing %s: %s", source["name"], result)
+            else:
+                stats["feeds_processed"] += 1
+                stats["new_articles"] += result["new_articles"]
+                
+                logger.info("Processed %s: %d new articles", source["name"], result["new_articles"])
         
         return stats
     
-    def _process_feed(self, source_id: int, name: str, url: str, feed_type: str, 
-                 last_updated: Optional[str], days_back: int) -> Dict[str, Any]:
+    @staticmethod
+    def _is_due(source: Dict[str, Any], now: datetime) -> bool:
+        """
+        Check whether a source's refresh interval has elapsed.
+        
+        Args:
+            source: Source dictionary
+            now: Current time
+            
+        Returns:
+            Whether the source should be refreshed
+        """
+        if not source.get("last_updated"):
+            return True
+        
+        interval = source.get("refresh_interval") or DEFAULT_REFRESH_INTERVAL
+        interval *= random.uniform(1 - REFRESH_JITTER, 1)
+        last_updated = datetime.fromisoformat(source["last_updated"])
+        return (now - last_updated).total_seconds() >= interval
+    
+    async def _update_sources(self, sources: List[Dict[str, Any]], days_back: int, 
+                              force: bool = False) -> List[Union[Dict[str, Any], BaseException]]:
+        """
+        Process sources concurrently within one async HTTP session.
+        
+        Args:
+            sources: Source dictionaries from the database
+            days_back: Only process articles from the last N days
+            force: Fetch feeds unconditionally, so unchanged feeds are
+                processed again instead of coming back as a 304
+            
+        Returns:
+            Result or error for each source, in the same order
+        """
+        async with self.extractor.async_session(max_concurrency=self.max_workers):
+            return await asyncio.gather(
+                *(
+                    self._process_feed(
+                        source["id"], 
+                        source["name"], 
+                        source["url"], 
+                        source["type"], 
+                        source.get("last_updated"), 
+                        days_back,
+                        etag=None if force else source.get("etag"),
+                        last_modified=None if force else source.get("last_modified")
+                    )
+                    for source in sources
+                ),
+                return_exceptions=True
+            )
+    
+    async def _process_feed(self, source_id: int, name: str, url: str, feed_type: str, 
+                 last_updated: Optional[str], days_back: int,
+                 etag: Optional[str] = None, 
+                 last_modified: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a feed and store new articles.
         
@@ -120,6 +205,8 @@ class ThreatIntelligenceMonitor:
             feed_type: Type of feed (rss, atom)
             last_updated: Timestamp of last update
             days_back: Only process articles from the last N days
+            etag: ETag from the previous fetch of the feed
+            last_modified: Last-Modified value from the previous fetch
             
         Returns:
             Statistics about the processing
@@ -129,62 +216,113 @@ class ThreatIntelligenceMonitor:
             "source_id": source_id,
             "name": name
         }
+        # One timestamp for everything this run records about the feed
+        now = datetime.now()
+        now_iso = now.isoformat()
         
         try:
-            # Parse the feed
-            feed = self.extractor.parse_feed(url, feed_type)
+            feed_data = await self.extractor.fetch_feed(url, etag=etag, last_modified=last_modified)
             
-            logger.info(f"Feed {name} has {len(feed.entries)} entries")
+            # Nothing to do if the feed hasn't changed since the last fetch
+            if feed_data["data"] is None:
+                logger.info("Feed %s not modified since last update", name)
+                await self._run_blocking(
+                    self.db.update_source_status, source_id, success=True, updated_iso=now_iso
+                )
+                return result
             
-            # Calculate cutoff date
-            cutoff_date = datetime.now() - timedelta(days=days_back)
+            # Parse the feed off the event loop
+            feed = await self._run_blocking(
+                self.extractor.parse_feed, feed_data["url"], feed_type, feed_data["data"], 
+                content_type=feed_data["content_type"]
+            )
             
-            # Update the last_updated timestamp for this source
-            self.db.update_source_status(source_id, success=True)
+            logger.info("Feed %s has %d entries", name, len(feed.entries))
             
-            # Process each entry in the feed
+            # Calculate cutoff date
+            cutoff_date = now - timedelta(days=days_back)
+            
+            # Skip entries older than days_back
+            entries = []
             for entry in feed.entries:
-                # Try to get the published date
                 pub_date = self.extractor.extract_published_date(entry)
-                
-                # Skip if older than days_back
-                if pub_date < cutoff_date:
-                    continue
-                
-                # Basic entry data
-                title = entry.title
-                link = entry.link
-                
-                # Get summary
-                summary = self.extractor.extract_entry_summary(entry)
-                
-                # Extract full content and keywords
-                full_content, keywords = self.extractor.extract_article_content(link)
-                
-                # Store in database
-                added = self.db.add_article(
-                    source_id=source_id,
-                    title=title,
-                    url=link,
-                    published_date=pub_date,
-                    summary=summary,
-                    full_content=full_content,
-                    keywords=keywords
-                )
-                
-                # Only increment counter if article was actually added
-                if added:
-                    result["new_articles"] += 1
+                if pub_date >= cutoff_date:
+                    entries.append((entry, pub_date))
+            
+            # Only fetch articles that aren't stored yet
+            new_urls = await self._run_blocking(
+                self.db.filter_new_urls, [entry.link for entry, _ in entries]
+            )
+            entries = [(entry, pub_date) for entry, pub_date in entries if entry.link in new_urls]
+            
+            # Extract full content and keywords for all entries concurrently
+            contents = await asyncio.gather(
+                *(self.extractor.extract_article_content_async(entry.link) for entry, _ in entries)
+            )
+            
+            # Collect new entries and store them in one batch
+            articles = []
+            for (entry, pub_date), (full_content, keywords, body_fp) in zip(entries, contents):
+                articles.append({
+                    "source_id": source_id,
+                    "title": entry.title,
+                    "url": entry.link,
+                    "published_date": pub_date,
+                    "summary": self.extractor.extract_entry_summary(entry),
+                    "full_content": full_content,
+                    "keywords": keywords,
+                    "body_fp": body_fp
+                })
+            
+            # Only articles that were actually added count as new (this raises
+            # if the batch can't be stored)
+            result["new_articles"] = await self._run_blocking(
+                self.db.add_articles_bulk, articles, now_iso
+            )
+            
+            # Mark the source updated and remember the cache validators only
+            # once the entries are stored, so a failed run is neither skipped
+            # as recently updated nor turned into a 304 for unprocessed entries
+            await self._run_blocking(
+                self.db.update_source_status, source_id, success=True, updated_iso=now_iso
+            )
+            await self._run_blocking(
+                self.db.update_source_headers, source_id, feed_data["etag"], feed_data["last_modified"]
+            )
             
             return result
             
         except Exception as e:
-            logger.error(f"Error processing feed {name}: {str(e)}")
+            logger.error("Error processing feed %s: %s", name, e)
             
             # Record error in database
-            self.db.update_source_status(source_id, success=False)
+            await self._run_blocking(self.db.update_source_status, source_id, success=False)
             raise
     
+    async def _run_blocking(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking call (database access, parsing) on the worker threads
+        so it doesn't stall the event loop.
+        
+        Args:
+            func: Function to call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            The function's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    def close(self) -> None:
+        """
+        Release the worker threads, HTTP client and database connections.
+        """
+        self._executor.shutdown()
+        self.extractor.close()
+        self.db.close()
+    
     def search_articles(self, query: Optional[str] = None, days: int = 7, 
                        limit: int = 20) -> List[Dict[str, Any]]:
         """
@@ -211,8 +349,7 @@ class ThreatIntelligenceMonitor:
         Returns:
             List of trending keywords with counts
         """
-        keywords = self.db.get_article_keywords(days=days)
-        return keywords[:limit]
+        return self.db.get_article_keywords(days=days, limit=limit)
     
     def export_to_json(self, articles: List[Dict[str, Any]], filename: str) -> None:
         """
@@ -225,22 +362,33 @@ class ThreatIntelligenceMonitor:
         # Ensure directory exists
         os.makedirs(os.path.dirname(os.path.abspath(filename)) or '.', exist_ok=True)
         
-        with open(filename, "w") as f:
-            json.dump({
-                "generated_at": datetime.now().isoformat(),
-                "article_count": len(articles),
-                "articles": articles
-            }, f, indent=2)
+        report = {
+            "generated_at": datetime.now().isoformat(),
+            "article_count": len(articles),
+            "articles": articles
+        }
+        
+        if orjson is not None:
+            # orjson encodes straight to bytes, much faster than json.dump
+            with open(filename, "wb") as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filename, "w") as f:
+                json.dump(report, f, indent=2)
         
-        logger.info(f"Exported {len(articles)} articles to {filename}")
+        logger.info("Exported %d articles to %s", len(articles), filename)
     
     def export_to_csv(self, articles: List[Dict[str, Any]], filename: str) -> None:
         """
         Export articles to CSV file.
         
         Args:
-            articles: List of article dictionaries
+            articles: List of article dictionaries, each with every column in
+                CSV_FIELDS (as returned by search_articles)
             filename: Output filename
+            
+        Raises:
+            KeyError: If an article is missing one of the exported columns
         """
         if not articles:
             logger.warning("No articles to export")
@@ -250,18 +398,14 @@ class ThreatIntelligenceMonitor:
         os.makedirs(os.path.dirname(os.path.abspath(filename)) or '.', exist_ok=True)
         
         with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f, 
-                fieldnames=["title", "source_name", "published_date", "url", "summary", "keywords"]
-            )
-            writer.writeheader()
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
             
-            for article in articles:
-                # Prepare a copy to avoid modifying the original
-                article_copy = {k: v for k, v in article.items() if k in writer.fieldnames}
-                writer.writerow(article_copy)
+            # Pull the exported columns straight out of each article as a tuple
+            row = operator.itemgetter(*CSV_FIELDS)
+            writer.writerows(map(row, articles))
         
-        logger.info(f"Exported {len(articles)} articles to {filename}")
+        logger.info("Exported %d articles to %s", len(articles), filename)
     
     def print_articles(self, articles: List[Dict[str, Any]]) -> None:
         """
@@ -291,12 +435,11 @@ class ThreatIntelligenceMonitor:
             
             # Format summary with wrapping for better readability
             if "summary" in article and article["summary"]:
-                wrapped_summary = '\n'.join([line.strip() for line in article["summary"].splitlines()])
+                wrapped_summary = '\n'.join(map(str.strip, article["summary"].splitlines()))
                 print(f"\nSummary:\n{wrapped_summary}")
             
             # Show keywords if available
             if "keywords" in article and article["keywords"]:
-                keywords = article["keywords"].split(",")
-                print(f"\nKeywords: {', '.join(keywords)}")
+                print(f"\nKeywords: {article['keywords'].replace(',', ', ')}")
             
             print("-" * 40)
\ No newline at end of file
@@ -3,21 +3,31 @@
 Utility functions and classes for the Threat Intelligence Monitor.
 """
 
+import functools
 import logging
 import os
 import random
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 
-# Common User-Agent strings for rotation
-USER_AGENTS = [
+# Common User-Agent strings for rotation (a tuple, so it can be shared
+# freely between worker threads)
+USER_AGENTS = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
-]
+)
+
+# Priority of feeds that don't set one (higher is processed first)
+DEFAULT_FEED_PRIORITY = 5
+
+# Minimum seconds between refreshes of a source unless it sets its own
+DEFAULT_REFRESH_INTERVAL = 3600
 
 # Default security feeds
 DEFAULT_SECURITY_FEEDS = [
@@ -78,41 +88,84 @@ def setup_logging(log_dir: str = "logs", verbose: bool = False) -> logging.Logge
     return logging.getLogger("threat_intel")
 
 
+@functools.lru_cache(maxsize=1024)
+def _netloc(url: str) -> str:
+    """
+    Get the lower-cased host (scheme authority) of a URL.
+    
+    The cache is keyed by the full URL, so it only saves work for URLs that
+    are requested repeatedly, i.e. feed URLs on every update; article URLs
+    are nearly all unique and just pass through it.
+    
+    Args:
+        url: URL to parse
+        
+    Returns:
+        Host part of the URL
+    """
+    return urlsplit(url).netloc.lower()
+
+
 class RateLimiter:
-    """Rate limiter to prevent overloading websites."""
+    """
+    Per-host rate limiter to prevent overloading websites.
+    
+    Each host (scheme authority) gets its own schedule: callers reserve the
+    next free request slot for that host under a short-lived lock and then
+    sleep outside it, so requests to different hosts never wait on each other.
+    """
     
-    def __init__(self, base_delay: float = 1.0):
+    def __init__(self, base_delay: float = 1.0, max_hosts: int = 1024):
         """
         Initialize the rate limiter.
         
         Args:
             base_delay: Base delay between requests in seconds
+            max_hosts: Maximum number of hosts to track (least recently used are evicted)
         """
         self.base_delay = base_delay
-        self.last_request: Dict[str, float] = {}  # Domain -> timestamp
+        self.max_hosts = max_hosts
+        self._last_by_host: "OrderedDict[str, float]" = OrderedDict()  # Host -> last slot
+        self._lock = threading.Lock()
     
-    def wait_if_needed(self, url: str) -> None:
+    def reserve(self, url: str) -> float:
         """
-        Wait appropriate time since last request to this domain.
+        Reserve the next request slot for the URL's host.
         
         Args:
-            url: URL to check for rate limiting
+            url: URL about to be requested
+            
+        Returns:
+            Seconds the caller must wait before sending the request
         """
-        domain = urlparse(url).netloc
-        current_time = time.time()
+        host = _netloc(url)
         
         # Add some randomness to appear more human-like
         delay = self.base_delay + random.uniform(0, self.base_delay * 0.5)
         
-        # Check if we need to wait
-        if domain in self.last_request:
-            elapsed = current_time - self.last_request[domain]
-            if elapsed < delay:
-                wait_time = delay - elapsed + random.uniform(0, 0.5)
-                time.sleep(wait_time)
+        with self._lock:
+            now = time.monotonic()
+            last = self._last_by_host.get(host)
+            slot = now if last is None else max(now, last + delay)
+            
+            # Reserve the slot and keep the host table bounded
+            self._last_by_host[host] = slot
+            self._last_by_host.move_to_end(host)
+            if len(self._last_by_host) > self.max_hosts:
+                self._last_by_host.popitem(last=False)
+        
+        return slot - now
+    
+    def wait_if_needed(self, url: str) -> None:
+        """
+        Wait appropriate time since last request to this host.
         
-        # Update last request time
-        self.last_request[domain] = time.time()
+        Args:
+            url: URL to check for rate limiting
+        """
+        wait_time = self.reserve(url)
+        if wait_time > 0:
+            time.sleep(wait_time)
 
 
 def get_random_user_agent() -> str:
@@ -142,7 +195,8 @@ def create_request_headers(user_agent: Optional[str] = None) -> Dict[str, str]:
         "User-Agent": user_agent,
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate, br",
+        # Only encodings httpx decodes without optional extras (brotli/zstd)
+        "Accept-Encoding": "gzip, deflate",
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1"
     }
\ No newline at end of file